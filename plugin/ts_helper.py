@@ -4,24 +4,41 @@ ts_helper.py - small CLI helper that uses tree_sitter Python bindings.
 
 Usage:
   python3 ts_helper.py --lang python ast
+  python3 ts_helper.py --lang python --file path/to/file.py folds
   python3 ts_helper.py --lang python node_at ROW COL
   python3 ts_helper.py --lang python symbols
   python3 ts_helper.py --lang python folds
+  python3 ts_helper.py --lang python --views symbols,folds,ast multi
+  python3 ts_helper.py serve
 
 Behavior:
 - Loads pip-installed language package named tree_sitter_<lang> and calls its language().
 - Creates Parser(lang) when available, otherwise falls back to Parser() + set_language().
+- Reads the source from stdin, or memory-maps it with --file PATH.
 - Commands:
-  - ast      : prints a nested AST (nodes with children and text)
+  - ast      : prints a nested AST (nodes with children and byte ranges;
+               --with-text adds the text of leaf nodes)
   - node_at  : prints the single smallest named node at ROW COL (0-based)
-  - symbols  : prints a list of symbol nodes (heuristic) with optional name
-  - folds    : prints a flat list of nodes that span multiple lines (type + start/end)
+  - symbols  : prints a list of symbol nodes with optional name (per-language
+               query from QUERIES, otherwise a node type heuristic)
+  - folds    : prints a flat list of nodes that span multiple lines (type + start/end);
+               a folds query from QUERIES or --fold-query QUERY restricts it to
+               the nodes the query captures
+  - multi    : prints {"symbols": ..., "folds": ..., "ast": ...} for the --views
+               requested, sharing one parse and one tree walk
+  - serve    : runs as a long-lived process reading Content-Length framed JSON
+               requests on stdin (see serve() below) and answering on stdout.
+               Parsers are kept per language and the last tree per buffer id,
+               so repeated requests reparse incrementally.
 """
 from __future__ import annotations
 import sys
 import argparse
+import functools
 import json
 import importlib
+import mmap
+from collections import OrderedDict
 from typing import Optional
 
 try:
@@ -30,14 +47,93 @@ except Exception:
     sys.stderr.write("Missing tree_sitter Python package: pip install tree-sitter\n")
     sys.exit(2)
 
+try:
+    from tree_sitter import Query
+except ImportError:
+    Query = None
+
+try:
+    from tree_sitter import QueryCursor
+except ImportError:
+    QueryCursor = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # Conservative symbol and fold defaults (can be refined by editor using per-language rules)
-DEFAULT_SYMBOL_NODE_TYPES = set([
+# (interned so membership tests can match on identity before hashing)
+DEFAULT_SYMBOL_NODE_TYPES = frozenset(map(sys.intern, (
     "function_definition", "function_declaration", "function_item",
     "method_definition", "method_declaration", "class_declaration",
     "class_definition", "class_specifier", "function", "method",
-])
-
+)))
+
+# Fallback name node types for symbols without a "name" field
+NAME_NODE_TYPES = frozenset(map(sys.intern, (
+    "identifier", "property_identifier", "type_identifier", "field_identifier",
+)))
+
+# Per-language queries, compiled once per process (see get_query).
+#   symbols: every pattern captures the symbol node as @sym and its name as
+#            @name, or its C/C++ declarator as @declarator (the name is found by
+#            declarator_name, declarators nest too deep to spell out here);
+#            languages without one use the DEFAULT_SYMBOL_NODE_TYPES walk.
+#   folds:   the nodes to fold; languages without one fold every node that
+#            spans multiple lines (g:ts_helper_fold_queries / --fold-query
+#            override it).
+QUERIES = {
+    "python": {
+        "symbols": """
+            (function_definition name: (identifier) @name) @sym
+            (class_definition name: (identifier) @name) @sym
+        """,
+    },
+    "javascript": {
+        "symbols": """
+            (function_declaration name: (identifier) @name) @sym
+            (class_declaration name: (identifier) @name) @sym
+            (method_definition name: (property_identifier) @name) @sym
+        """,
+    },
+    "c": {
+        "symbols": """
+            (function_definition declarator: (_) @declarator) @sym
+        """,
+    },
+    "cpp": {
+        "symbols": """
+            (function_definition declarator: (_) @declarator) @sym
+            (class_specifier name: (_)? @name) @sym
+        """,
+    },
+    "java": {
+        "symbols": """
+            (class_declaration name: (identifier) @name) @sym
+            (method_declaration name: (identifier) @name) @sym
+        """,
+    },
+    "rust": {
+        "symbols": """
+            (function_item name: (identifier) @name) @sym
+        """,
+    },
+    "go": {
+        "symbols": """
+            (function_declaration name: (identifier) @name) @sym
+            (method_declaration name: (field_identifier) @name) @sym
+        """,
+    },
+    "yaml": {
+        "folds": """
+            [(block_mapping_pair) (block_sequence_item)] @fold
+        """,
+    },
+}
+
+@functools.lru_cache(maxsize=32)
 def load_language_from_package(lang_name: str):
     mod_name = f"tree_sitter_{lang_name}"
     try:
@@ -80,40 +176,212 @@ def make_parser_for_language(lang):
         return p
 
 
-def node_to_dict(node, source_bytes: bytes, include_text: bool = False, max_text: int = 120):
-    # Some nodes may lack start_point / end_point; guard accordingly
+class RawJSON:
+    """Already encoded JSON (bytes or bytearray), passed through by encode_parts()."""
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+# Opening of one AST node, up to (not including) "text" and "children"
+AST_NODE_JSON = (b'{"type":%s,"named":%s,"start_point":[%d,%d],"end_point":[%d,%d],'
+                 b'"start_byte":%d,"end_byte":%d')
+
+
+def dumps(obj) -> bytes:
+    # orjson encodes straight to bytes and is much faster on the large AST output
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf8")
+
+
+def encode_parts(obj, parts: list) -> list:
+    """
+    Append the JSON encoding of obj to parts as a sequence of chunks.
+    RawJSON values inside (nested) dicts are appended as-is, so a large
+    pre-encoded AST is written out without being copied into a new string.
+    """
+    if isinstance(obj, RawJSON):
+        parts.append(obj.data)
+    elif isinstance(obj, dict) and obj:
+        sep = b"{"
+        for k, v in obj.items():
+            parts.append(sep + dumps(k) + b":")
+            encode_parts(v, parts)
+            sep = b","
+        parts.append(b"}")
+    else:
+        parts.append(dumps(obj))
+    return parts
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compile_query(lang, source: str):
+    # Language.query() on older bindings, Query(lang, source) on newer ones
+    if hasattr(lang, "query"):
+        return lang.query(source)
+    return Query(lang, source)
+
+
+def query_matches(query, node):
+    """
+    Yield (pattern_index, {capture_name: node}) for every match under node,
+    normalizing the return shapes of the different binding versions.
+    """
+    if QueryCursor is not None:
+        matches = QueryCursor(query).matches(node)
+    else:
+        matches = query.matches(node)
+    for pattern_index, captures in matches:
+        yield pattern_index, {
+            name: (nodes[0] if isinstance(nodes, list) else nodes)
+            for name, nodes in captures.items()
+        }
+
+
+def query_captures(query, node):
+    # Captured nodes in pre-order (source order, parents first), deduplicated
+    if QueryCursor is not None:
+        captures = QueryCursor(query).captures(node)
+    else:
+        captures = query.captures(node)
+    if isinstance(captures, dict):
+        nodes = [n for ns in captures.values() for n in ns]
+    else:
+        nodes = [n for n, _ in captures]
+    nodes.sort(key=lambda n: (n.start_byte, -n.end_byte))
+    out = []
+    seen = set()
+    for n in nodes:
+        key = (n.start_byte, n.end_byte, n.type)
+        if key not in seen:
+            seen.add(key)
+            out.append(n)
+    return out
+
+
+# Parsers and compiled queries are cached per language name so repeated
+# commands in one process (serve mode) reuse them. py-tree-sitter objects
+# do not take extra attributes, hence caches instead of parser attributes.
+
+@functools.lru_cache(maxsize=32)
+def get_parser(lang_name: str):
+    return make_parser_for_language(load_language(lang_name))
+
+
+@functools.lru_cache(maxsize=32)
+def get_query(lang_name: str, kind: str):
+    # Compiled QUERIES[lang_name][kind], or None when there is none
+    source = QUERIES.get(lang_name, {}).get(kind)
+    if source is None:
+        return None
     try:
-        srow, scol = node.start_point
-        erow, ecol = node.end_point
-    except Exception:
-        srow = scol = erow = ecol = 0
+        return compile_query(load_language(lang_name), source)
+    except Exception as e:
+        sys.stderr.write(f"Invalid {kind} query for {lang_name}, ignoring it: {e}\n")
+        return None
+
+
+@functools.lru_cache(maxsize=32)
+def get_fold_query(lang_name: str, source: str):
+    try:
+        return compile_query(load_language(lang_name), source)
+    except Exception as e:
+        raise RuntimeError(f"Invalid fold query for {lang_name}: {e}")
+
+
+def slice_text(source_bytes: bytes, start_byte: int, end_byte: int, max_text: int = 120) -> str:
+    # One-line preview with whitespace runs collapsed. Only decode a window of
+    # max_text + 1 characters (4 bytes each at worst in UTF-8), widened while
+    # collapsing leaves it too short, so huge nodes cost no more than small ones;
+    # a character split by the window edge is always past the cut below.
+    limit = (max_text + 1) * 4
+    while True:
+        end = min(end_byte, start_byte + limit)
+        text = " ".join(source_bytes[start_byte:end].decode("utf8", "replace").split())
+        if end == end_byte or len(text) > max_text:
+            break
+        limit *= 2
+    if len(text) > max_text:
+        text = text[:max_text - 3] + "..."
+    return text
+
+
+def map_source_file(path: str):
+    # Read-only mapping: the parser reads it in place, no pipe or bytes copy.
+    # mmap refuses empty files, which parse as empty input anyway.
+    with open(path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b""
+
+
+def node_to_dict(node, source_bytes: bytes, include_text: bool = False, max_text: int = 120):
+    srow, scol = node.start_point
+    erow, ecol = node.end_point
     d = {
-        "type": getattr(node, "type", None),
-        "named": getattr(node, "is_named", False),
+        "type": node.type,
+        "named": node.is_named,
         "start_point": [srow, scol],
         "end_point": [erow, ecol],
-        "start_byte": getattr(node, "start_byte", 0),
-        "end_byte": getattr(node, "end_byte", 0),
+        "start_byte": node.start_byte,
+        "end_byte": node.end_byte,
     }
     if include_text:
-        try:
-            text = source_bytes[d["start_byte"]:d["end_byte"]].decode("utf8", "replace")
-            text = " ".join(text.split())
-            if len(text) > max_text:
-                text = text[:max_text - 3] + "..."
-            d["text"] = text
-        except Exception:
-            d["text"] = ""
+        d["text"] = slice_text(source_bytes, d["start_byte"], d["end_byte"], max_text)
     return d
 
 
-def walk_node(node, source_bytes: bytes):
-    d = node_to_dict(node, source_bytes, include_text=True)
-    children = []
-    for child in getattr(node, "children", []):
-        children.append(walk_node(child, source_bytes))
-    d["children"] = children
-    return d
+def write_ast(root, source_bytes: bytes, buf: bytearray, with_text: bool = False,
+              max_text: int = 120, visit=None):
+    """
+    Serialize the AST under root straight into buf as JSON, in a single
+    TreeCursor pass and without building per-node dicts.
+    Only byte ranges are emitted by default; with_text adds "text" to leaf
+    nodes (inner node text is just the concatenation of its leaves).
+    visit(node, start_row, end_row), when given, is called for every node in
+    pre-order, so other views can be collected in the same pass.
+    """
+    # kind_id -> (encoded type, encoded is_named): both only depend on the
+    # node's grammar symbol, and an int key avoids creating the type string
+    kinds = {}
+    template = AST_NODE_JSON + b',"children":['
+    cur = root.walk()
+    goto_first_child = cur.goto_first_child
+    goto_next_sibling = cur.goto_next_sibling
+    goto_parent = cur.goto_parent
+    extend = buf.extend
+    while True:
+        node = cur.node
+        kind = kinds.get(node.kind_id)
+        if kind is None:
+            kind = kinds[node.kind_id] = (dumps(node.type), b"true" if node.is_named else b"false")
+        start_byte = node.start_byte
+        end_byte = node.end_byte
+        srow, scol = node.start_point
+        erow, ecol = node.end_point
+        if visit is not None:
+            visit(node, srow, erow)
+        if with_text and node.child_count == 0:
+            extend(AST_NODE_JSON % (kind[0], kind[1], srow, scol, erow, ecol, start_byte, end_byte))
+            extend(b',"text":' + dumps(slice_text(source_bytes, start_byte, end_byte, max_text)) + b',"children":[')
+        else:
+            extend(template % (kind[0], kind[1], srow, scol, erow, ecol, start_byte, end_byte))
+        if goto_first_child():
+            continue
+        extend(b"]}")
+        while not goto_next_sibling():
+            if not goto_parent():
+                return buf
+            extend(b"]}")
+        extend(b",")
 
 
 def find_smallest_named_at(root, row: int, col: int):
@@ -123,70 +391,533 @@ def find_smallest_named_at(root, row: int, col: int):
         return None
 
 
-def collect_symbols(root, symbol_types: Optional[set] = None):
+def collect_symbols(root, symbol_types: Optional[frozenset] = None):
     if symbol_types is None:
         symbol_types = DEFAULT_SYMBOL_NODE_TYPES
+    # Pre-order cursor walk (already in source order); everything used per
+    # node is bound to a local first.
     out = []
+    append = out.append
+    cur = root.walk()
+    goto_first_child = cur.goto_first_child
+    goto_next_sibling = cur.goto_next_sibling
+    goto_parent = cur.goto_parent
+    while True:
+        n = cur.node
+        if n.type in symbol_types:
+            append(n)
+        if goto_first_child():
+            continue
+        while not goto_next_sibling():
+            if not goto_parent():
+                return out
+
+
+def collect_folds(root, query=None):
+    """
+    Return a flat list of nodes that span multiple lines. Each item is a dict:
+      { type, start_point, end_point, start_byte, end_byte }
+    This is a lightweight list used by the editor to compute fold levels.
+    When query is given only its captured nodes are considered.
+    Nodes come out in pre-order, which is already sorted by start position.
+    Single-line nodes are not descended into: their children are single-line too.
+    """
+    if query is not None:
+        return [n for n in query_captures(query, root) if n.end_point[0] > n.start_point[0]]
+    out = []
+    append = out.append
+    cur = root.walk()
+    goto_first_child = cur.goto_first_child
+    goto_next_sibling = cur.goto_next_sibling
+    goto_parent = cur.goto_parent
+    while True:
+        n = cur.node
+        if n.end_point[0] > n.start_point[0]:
+            append(n)
+            if goto_first_child():
+                continue
+        while not goto_next_sibling():
+            if not goto_parent():
+                return out
+
+
+def cmd_ast(lang_name: str, root, source_bytes: bytes, args, opts):
+    if not root:
+        return {}
+    return RawJSON(write_ast(root, source_bytes, bytearray(), with_text=opts.get("with_text", False)))
+
+
+def cmd_node_at(lang_name: str, root, source_bytes: bytes, args, opts):
+    row, col = int(args[0]), int(args[1])
+    if not root:
+        return {}
+    node = find_smallest_named_at(root, row, col)
+    if node is None:
+        return {}
+    d = node_to_dict(node, source_bytes, include_text=True)
+    d["children_count"] = node.child_count
+    return d
 
-    def visit(n):
-        ntype = getattr(n, "type", None)
-        if ntype in symbol_types:
-            out.append(n)
-        for c in getattr(n, "children", []):
-            visit(c)
 
-    visit(root)
-    out.sort(key=lambda n: (n.start_point[0], n.start_point[1]))
+def symbol_name_node(n):
+    # Heuristic name lookup for symbols found by node type
+    name_node = n.child_by_field_name("name")
+    if name_node is None:
+        for c in n.children:
+            if c.type in NAME_NODE_TYPES:
+                return c
+    return name_node
+
+
+def symbol_to_dict(n, name_node, source_bytes: bytes):
+    d = node_to_dict(n, source_bytes, include_text=False)
+    d['name'] = None if name_node is None else source_bytes[name_node.start_byte:name_node.end_byte].decode('utf8', 'replace')
+    return d
+
+
+def declarator_name(n):
+    # C/C++ declarators wrap the name in pointer, reference, parenthesized and
+    # function declarators, e.g. int (*g(int x))(int); unwrap to the innermost
+    while n is not None and n.type.endswith("declarator"):
+        inner = n.child_by_field_name("declarator")
+        if inner is None:
+            inner = n.named_children[0] if n.named_child_count else None
+        n = inner
+    return n
+
+
+def query_symbols(query, root, source_bytes: bytes):
+    out = []
+    for _, captures in query_matches(query, root):
+        n = captures.get("sym")
+        if n is not None:
+            name_node = captures.get("name")
+            if name_node is None:
+                name_node = declarator_name(captures.get("declarator"))
+            out.append(symbol_to_dict(n, name_node, source_bytes))
+    out.sort(key=lambda d: (d["start_point"][0], d["start_point"][1]))
     return out
 
 
-def collect_folds(root):
+def fold_to_dict(n):
+    srow, scol = n.start_point
+    erow, ecol = n.end_point
+    return {
+        "type": n.type,
+        "start_point": [srow, scol],
+        "end_point": [erow, ecol],
+        "start_byte": n.start_byte,
+        "end_byte": n.end_byte,
+    }
+
+
+def walk_multi(root, source_bytes: bytes, symbol_types=None, want_folds: bool = False,
+               want_ast: bool = False, with_text: bool = False, max_text: int = 120):
     """
-    Return a flat list of nodes that span multiple lines. Each item is a dict:
-      { type, start_point, end_point, start_byte, end_byte }
-    This is a lightweight list used by the editor to compute fold levels.
+    Several views of one tree. Returns (symbol nodes, fold nodes, ast):
+    symbols are only collected when symbol_types is given, folds when
+    want_folds, the ast when want_ast (RawJSON from write_ast, otherwise
+    None). With the ast, symbols and folds are collected by the write_ast
+    pass itself.
     """
-    out = []
+    syms = []
+    folds = []
+    if not want_ast:
+        if symbol_types is not None:
+            syms = collect_symbols(root, symbol_types)
+        if want_folds:
+            folds = collect_folds(root)
+        return syms, folds, None
+    visit = None
+    if symbol_types is not None or want_folds:
+        add_sym = syms.append
+        add_fold = folds.append
+
+        def visit(node, srow, erow):
+            if symbol_types is not None and node.type in symbol_types:
+                add_sym(node)
+            if want_folds and erow > srow:
+                add_fold(node)
+    buf = write_ast(root, source_bytes, bytearray(), with_text, max_text, visit)
+    return syms, folds, RawJSON(buf)
+
+
+# Template for get_walker(); {checks} is filled with per-node tests that use
+# constants baked in for one language.
+_WALKER_TEMPLATE = """
+def walk(root):
+    syms = []
+    folds = []
+    add_sym = syms.append
+    add_fold = folds.append
+    cur = root.walk()
+    goto_first_child = cur.goto_first_child
+    goto_next_sibling = cur.goto_next_sibling
+    goto_parent = cur.goto_parent
+    while True:
+        node = cur.node
+{checks}
+        if {descend}goto_first_child():
+            continue
+        while not goto_next_sibling():
+            if not goto_parent():
+                return syms, folds
+"""
 
-    def visit(n):
+
+def symbol_kind_ids(lang, symbol_types) -> frozenset:
+    # Every grammar symbol id whose node type is in symbol_types
+    return frozenset(
+        kind_id for kind_id in range(lang.node_kind_count)
+        if lang.node_kind_for_id(kind_id) in symbol_types
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def get_walker(lang_name: str, symbols: bool, folds: bool):
+    """
+    Return walk(root) -> (symbol nodes, fold nodes), generated for one
+    language: the DEFAULT_SYMBOL_NODE_TYPES test becomes a comparison chain
+    on the grammar's own kind ids (types the grammar lacks disappear), and
+    unrequested views cost nothing. A folds-only walk skips single-line
+    subtrees, which cannot hold a multi-line node. None when the bindings
+    cannot list the grammar's node kinds.
+    """
+    checks = []
+    if symbols:
         try:
-            sp = n.start_point[0]
-            ep = n.end_point[0]
-        except Exception:
-            return
-        if ep > sp:
-            out.append(n)
-        for c in getattr(n, "children", []):
-            visit(c)
+            ids = sorted(symbol_kind_ids(load_language(lang_name), DEFAULT_SYMBOL_NODE_TYPES))
+        except AttributeError:
+            return None
+        if ids:
+            checks.append("        kind = node.kind_id")
+            checks.append("        if " + " or ".join(f"kind == {i}" for i in ids) + ":")
+            checks.append("            add_sym(node)")
+    descend = ""
+    if folds:
+        # symbol checks need every node; folds alone only multi-line ones
+        descend = "" if checks else "multiline and "
+        checks.append("        multiline = node.end_point[0] > node.start_point[0]")
+        checks.append("        if multiline:")
+        checks.append("            add_fold(node)")
+    if not checks:
+        # nothing can match in this grammar: skip the walk entirely
+        return lambda root: ([], [])
+    source = _WALKER_TEMPLATE.format(checks="\n".join(checks), descend=descend)
+    namespace = {}
+    code = compile(source, f"<ts_helper walker: {lang_name}>", "exec")
+    exec(code, namespace)
+    return namespace["walk"]
+
+
+def cmd_symbols(lang_name: str, root, source_bytes: bytes, args, opts):
+    if not root:
+        return []
+    query = get_query(lang_name, "symbols")
+    if query is not None:
+        return query_symbols(query, root, source_bytes)
+    walk = get_walker(lang_name, True, False)
+    syms = walk(root)[0] if walk is not None else collect_symbols(root)
+    return [symbol_to_dict(n, symbol_name_node(n), source_bytes) for n in syms]
+
+
+def cmd_folds(lang_name: str, root, source_bytes: bytes, args, opts):
+    if not root:
+        return []
+    fold_query = opts.get("fold_query")
+    query = get_fold_query(lang_name, fold_query) if fold_query else get_query(lang_name, "folds")
+    return [fold_to_dict(n) for n in collect_folds(root, query)]
+
+
+VIEWS = ("symbols", "folds", "ast")
+
+
+def cmd_multi(lang_name: str, root, source_bytes: bytes, args, opts):
+    """
+    Several views from one parse, e.g. {"symbols": [...], "folds": [...]}.
+    Views without a query are computed together in a single pass (the
+    generated get_walker() walk, or walk_multi when the ast is requested);
+    symbol and fold queries, when present, run in C and take precedence.
+    """
+    views = opts.get("views") or ["symbols", "folds"]
+    if isinstance(views, str):
+        views = views.split(",")
+    for v in views:
+        if v not in VIEWS:
+            raise ValueError(f"unknown view: {v}")
+    if not root:
+        return {v: ({} if v == "ast" else []) for v in views}
+
+    symbol_query = get_query(lang_name, "symbols") if "symbols" in views else None
+    fold_query = None
+    if "folds" in views:
+        fold_query = opts.get("fold_query")
+        fold_query = get_fold_query(lang_name, fold_query) if fold_query else get_query(lang_name, "folds")
+    walk_symbols = "symbols" in views and symbol_query is None
+    walk_folds = "folds" in views and fold_query is None
+    syms, folds, ast = [], [], None
+    walk = None
+    if "ast" not in views and (walk_symbols or walk_folds):
+        walk = get_walker(lang_name, walk_symbols, walk_folds)
+    if walk is not None:
+        syms, folds = walk(root)
+    elif walk_symbols or walk_folds or "ast" in views:
+        syms, folds, ast = walk_multi(
+            root, source_bytes,
+            symbol_types=DEFAULT_SYMBOL_NODE_TYPES if walk_symbols else None,
+            want_folds=walk_folds,
+            want_ast="ast" in views,
+            with_text=opts.get("with_text", False),
+        )
 
-    visit(root)
-    out.sort(key=lambda n: (n.start_point[0], n.start_point[1]))
+    out = {}
+    if "symbols" in views:
+        if symbol_query is not None:
+            out["symbols"] = query_symbols(symbol_query, root, source_bytes)
+        else:
+            out["symbols"] = [symbol_to_dict(n, symbol_name_node(n), source_bytes) for n in syms]
+    if "folds" in views:
+        if fold_query is not None:
+            folds = collect_folds(root, fold_query)
+        out["folds"] = [fold_to_dict(n) for n in folds]
+    if "ast" in views:
+        out["ast"] = ast
     return out
 
 
+COMMANDS = {
+    "ast": cmd_ast,
+    "node_at": cmd_node_at,
+    "symbols": cmd_symbols,
+    "folds": cmd_folds,
+    "multi": cmd_multi,
+}
+
+
+# ------------------------
+# Daemon mode
+# ------------------------
+
+# buffer id -> (lang name, source bytes, tree), least recently used first
+MAX_CACHED_BUFFERS = 10
+_BUFFERS = OrderedDict()
+
+
+def _point_at(source_bytes: bytes, offset: int):
+    row = source_bytes.count(b"\n", 0, offset)
+    return (row, offset - (source_bytes.rfind(b"\n", 0, offset) + 1))
+
+
+def compute_edit(old: bytes, new: bytes):
+    """
+    Derive a single tree.edit() range from the common prefix and suffix of
+    two versions of a buffer. Used when the editor sends the full text
+    without an explicit edit.
+    """
+    limit = min(len(old), len(new))
+    # binary search on slice equality keeps the comparisons in C
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[:mid] == new[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    start = lo
+    lo, hi = 0, limit - start
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:] == new[len(new) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    old_end = len(old) - lo
+    new_end = len(new) - lo
+    return {
+        "start_byte": start,
+        "old_end_byte": old_end,
+        "new_end_byte": new_end,
+        "start_point": _point_at(new, start),
+        "old_end_point": _point_at(old, old_end),
+        "new_end_point": _point_at(new, new_end),
+    }
+
+
+def parse_buffer(buf, lang_name: str, source_bytes: Optional[bytes] = None, edit: Optional[dict] = None):
+    """
+    Return (source_bytes, tree) for a buffer, reparsing incrementally against
+    the cached tree when one exists for the same language.
+    """
+    cached = _BUFFERS.pop(buf, None)
+    if cached is not None and cached[0] != lang_name:
+        cached = None
+    if source_bytes is None:
+        if cached is None:
+            raise ValueError(f"no cached source for buffer {buf}")
+        _BUFFERS[buf] = cached
+        return cached[1], cached[2]
+
+    parser = get_parser(lang_name)
+    if cached is None:
+        tree = parser.parse(source_bytes)
+    elif cached[1] == source_bytes:
+        tree = cached[2]
+    else:
+        old_tree = cached[2]
+        if edit is None:
+            edit = compute_edit(cached[1], source_bytes)
+        old_tree.edit(
+            start_byte=edit["start_byte"],
+            old_end_byte=edit["old_end_byte"],
+            new_end_byte=edit["new_end_byte"],
+            start_point=tuple(edit["start_point"]),
+            old_end_point=tuple(edit["old_end_point"]),
+            new_end_point=tuple(edit["new_end_point"]),
+        )
+        tree = parser.parse(source_bytes, old_tree)
+
+    _BUFFERS[buf] = (lang_name, source_bytes, tree)
+    while len(_BUFFERS) > MAX_CACHED_BUFFERS:
+        _BUFFERS.popitem(last=False)
+    return source_bytes, tree
+
+
+def read_message(stream):
+    # LSP-style framing: headers, blank line, then Content-Length bytes of JSON
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            raise EOFError
+        line = line.strip()
+        if not line:
+            if length is None:
+                continue
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value.strip())
+    return loads(stream.read(length))
+
+
+def write_message(stream, msg):
+    parts = encode_parts(msg, [])
+    stream.write(b"Content-Length: %d\r\n\r\n" % sum(map(len, parts)))
+    for part in parts:
+        stream.write(part)
+    stream.flush()
+
+
+def handle_request(method: str, params: dict):
+    if method == "close":
+        _BUFFERS.pop(params.get("buf"), None)
+        return None
+    if method == "edit":
+        # reparse only; lets the editor keep the tree warm without a query
+        method = None
+    elif method not in COMMANDS:
+        raise ValueError(f"unknown method: {method}")
+    text = params.get("text")
+    source_bytes = text.encode("utf8") if text is not None else None
+    if source_bytes is None and params.get("file"):
+        # Read rather than mmap: the source is kept for diffing against the
+        # next version and the file may be rewritten in the meantime
+        with open(params["file"], "rb") as f:
+            source_bytes = f.read()
+    source_bytes, tree = parse_buffer(params.get("buf", 0), params["lang"], source_bytes, params.get("edit"))
+    if method is None:
+        return None
+    return COMMANDS[method](params["lang"], tree.root_node, source_bytes, params.get("args", []), params.get("opts") or {})
+
+
+def serve(stdin=None, stdout=None):
+    """
+    Request:  {"id": N, "method": "ast"|"node_at"|"symbols"|"folds"|"multi"|"edit"|"close",
+               "params": {"buf": ID, "lang": NAME, "text": SOURCE, "file": PATH, "edit": {...},
+                          "args": [...], "opts": {"with_text": BOOL, "fold_query": QUERY, "views": [...]}}}
+    Response: {"id": N, "result": ...} or {"id": N, "error": {"code": C, "message": M}}
+    "file" is read instead of "text" when only the path is given; with neither
+    the cached tree of "buf" is queried. "edit" holds the
+    tree.edit() keyword arguments; without it the edit is computed by diffing
+    against the cached source. Requests without an "id" get no response.
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    while True:
+        try:
+            msg = read_message(stdin)
+        except EOFError:
+            return
+        except ValueError as e:
+            write_message(stdout, {"jsonrpc": "2.0", "id": None,
+                                   "error": {"code": -32700, "message": str(e)}})
+            continue
+        if not isinstance(msg, dict):
+            write_message(stdout, {"jsonrpc": "2.0", "id": None,
+                                   "error": {"code": -32600, "message": "request must be a JSON object"}})
+            continue
+        msg_id = msg.get("id")
+        try:
+            result = handle_request(msg.get("method"), msg.get("params") or {})
+            reply = {"jsonrpc": "2.0", "id": msg_id, "result": result}
+        except Exception as e:
+            reply = {"jsonrpc": "2.0", "id": msg_id, "error": {"code": -32603, "message": str(e)}}
+        if msg_id is not None:
+            write_message(stdout, reply)
+
+
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument('--lang', required=True, help='Language name (e.g. python, javascript)')
-    p.add_argument('cmd', choices=['ast', 'node_at', 'symbols', 'folds'])
+    p.add_argument('--lang', help='Language name (e.g. python, javascript)')
+    p.add_argument('cmd', choices=['ast', 'node_at', 'symbols', 'folds', 'multi', 'serve'])
+    p.add_argument('--with-text', action='store_true', help='ast: include the source text of leaf nodes')
+    p.add_argument('--fold-query', help='folds: only fold nodes captured by this tree-sitter query')
+    p.add_argument('--views', default='symbols,folds', help='multi: comma separated views (symbols, folds, ast)')
+    p.add_argument('--file', help='Read the source from this file instead of stdin')
     p.add_argument('args', nargs='*')
     args = p.parse_args()
+    opts = {"with_text": args.with_text, "fold_query": args.fold_query, "views": args.views}
+
+    if args.cmd == "serve":
+        serve()
+        return
+    if not args.lang:
+        p.error("--lang is required")
+
+    if args.cmd == "node_at":
+        if len(args.args) < 2:
+            sys.stderr.write("node_at requires ROW COL\n")
+            sys.exit(7)
+        try:
+            int(args.args[0])
+            int(args.args[1])
+        except Exception:
+            sys.stderr.write("Invalid ROW/COL\n")
+            sys.exit(8)
 
     try:
-        lang = load_language(args.lang)
+        load_language(args.lang)
     except Exception as e:
         sys.stderr.write(f"Error loading language: {e}\n")
         sys.exit(4)
 
     try:
-        parser = make_parser_for_language(lang)
+        parser = get_parser(args.lang)
     except Exception as e:
         sys.stderr.write(f"Failed to construct parser: {e}\n")
         sys.exit(5)
 
-    try:
-        source_bytes = sys.stdin.buffer.read() or b""
-    except Exception:
-        source_bytes = b""
+    if args.file:
+        try:
+            source_bytes = map_source_file(args.file)
+        except OSError as e:
+            sys.stderr.write(f"Cannot read {args.file}: {e}\n")
+            sys.exit(3)
+    else:
+        try:
+            source_bytes = sys.stdin.buffer.read() or b""
+        except Exception:
+            source_bytes = b""
 
     # Allow empty input gracefully
     try:
@@ -196,76 +927,18 @@ def main():
         # If parse fails, return sensible empty results
         root = None
 
-    if args.cmd == "ast":
-        if not root:
-            print(json.dumps({}))
-            return
-        ast = walk_node(root, source_bytes)
-        print(json.dumps(ast))
-        return
-
-    if args.cmd == "node_at":
-        if len(args.args) < 2:
-            sys.stderr.write("node_at requires ROW COL\n")
-            sys.exit(7)
-        try:
-            row = int(args.args[0])
-            col = int(args.args[1])
-        except Exception:
-            sys.stderr.write("Invalid ROW/COL\n")
-            sys.exit(8)
-        if not root:
-            print(json.dumps({}))
-            return
-        node = find_smallest_named_at(root, row, col)
-        if node is None:
-            print(json.dumps({}))
-            return
-        d = node_to_dict(node, source_bytes, include_text=True)
-        d["children_count"] = len(getattr(node, "children", []))
-        print(json.dumps(d))
-        return
-
-    if args.cmd == "symbols":
-        if not root:
-            print(json.dumps([]))
-            return
-        syms = collect_symbols(root)
-        out = []
-        for n in syms:
-            name = None
-            for c in getattr(n, "children", []):
-                ctype = getattr(c, "type", "")
-                if 'name' in ctype or 'identifier' in ctype or ctype == 'identifier':
-                    try:
-                        name = source_bytes[c.start_byte:c.end_byte].decode('utf8', 'replace')
-                        name = " ".join(name.split())
-                        break
-                    except Exception:
-                        name = None
-            d = node_to_dict(n, source_bytes, include_text=False)
-            d['name'] = name
-            out.append(d)
-        print(json.dumps(out))
-        return
-
-    if args.cmd == "folds":
-        if not root:
-            print(json.dumps([]))
-            return
-        nodes = collect_folds(root)
-        out = []
-        for n in nodes:
-            d = {
-                "type": getattr(n, "type", None),
-                "start_point": [n.start_point[0], n.start_point[1]],
-                "end_point": [n.end_point[0], n.end_point[1]],
-                "start_byte": getattr(n, "start_byte", 0),
-                "end_byte": getattr(n, "end_byte", 0),
-            }
-            out.append(d)
-        print(json.dumps(out))
-        return
+    try:
+        result = COMMANDS[args.cmd](args.lang, root, source_bytes, args.args, opts)
+    except Exception as e:
+        # the one guard around command handlers; they access nodes directly
+        sys.stderr.write(f"{args.cmd} failed: {e}\n")
+        sys.exit(9)
+    # Encoded chunks go straight to the binary stream, so a large payload
+    # is never copied just to join it or append the newline
+    out = sys.stdout.buffer
+    for part in encode_parts(result, []):
+        out.write(part)
+    out.write(b"\n")
 
 
 if __name__ == "__main__":
@@ -7,6 +7,9 @@
 "   let g:ts_helper_filetype_map = {'py': 'python', 'js': 'javascript'}
 "   let g:ts_helper_auto_folds = 1
 "   let g:ts_helper_fold_node_types = {}
+"   let g:ts_helper_fold_queries = {'python': '[(block) (class_definition)] @fold'}
+"   let g:ts_helper_use_daemon = 1   (keep one `ts_helper.py serve` process running; needs Vim 8.2.4648+)
+"   let g:ts_helper_timeout = 5000   (ms to wait for a daemon reply before falling back)
 
 if exists('g:loaded_ts_helper_plugin')
   finish
@@ -58,8 +61,18 @@ function! s:ft_to_lang() abort
 endfunction
 
 " Helper: build command list (list form) and string form for systemlist fallback
-function! s:build_cmd_list(lang, cmdname, args_string) abort
-  let parts = ['python3', s:helper_py, '--lang', a:lang, a:cmdname]
+function! s:build_cmd_list(lang, cmdname, args_string, opts) abort
+  let parts = ['python3', s:helper_py, '--lang', a:lang]
+  if get(a:opts, 'with_text', 0)
+    call add(parts, '--with-text')
+  endif
+  if !empty(get(a:opts, 'fold_query', ''))
+    call extend(parts, ['--fold-query', a:opts.fold_query])
+  endif
+  if !empty(get(a:opts, 'file', ''))
+    call extend(parts, ['--file', a:opts.file])
+  endif
+  call add(parts, a:cmdname)
   if a:args_string !=# ''
     let args = split(a:args_string)
     call extend(parts, args)
@@ -67,16 +80,99 @@ function! s:build_cmd_list(lang, cmdname, args_string) abort
   return parts
 endfunction
 
-function! s:build_cmd_str(lang, cmdname, args_string) abort
-  let parts = s:build_cmd_list(a:lang, a:cmdname, a:args_string)
+function! s:build_cmd_str(lang, cmdname, args_string, opts) abort
+  let parts = s:build_cmd_list(a:lang, a:cmdname, a:args_string, a:opts)
   " Quote helper path and python3 for safety
   let quoted = map(parts, 'shellescape(v:val)')
   return join(quoted, ' ')
 endfunction
 
-" Synchronous helper caller using systemlist().
+" ------------------------
+" Persistent helper process (daemon)
+" ------------------------
+
+let s:daemon_job = v:none
+
+" Return the channel of the running helper daemon, starting it if needed.
+" Returns v:none when the daemon is disabled or unavailable.
+function! s:daemon_channel() abort
+  if !get(g:, 'ts_helper_use_daemon', 1) || !has('job') || !has('patch-8.2.4648')
+    return v:none
+  endif
+  if type(s:daemon_job) == v:t_job && job_status(s:daemon_job) ==# 'run'
+    return job_getchannel(s:daemon_job)
+  endif
+  try
+    let s:daemon_job = job_start(['python3', s:helper_py, 'serve'], {
+          \ 'in_mode': 'lsp',
+          \ 'out_mode': 'lsp',
+          \ 'err_mode': 'nl',
+          \ 'noblock': 1,
+          \ })
+  catch
+    let s:daemon_job = v:none
+    return v:none
+  endtry
+  if job_status(s:daemon_job) !=# 'run'
+    let s:daemon_job = v:none
+    return v:none
+  endif
+  return job_getchannel(s:daemon_job)
+endfunction
+
+" Send a request to the daemon. Returns [ok, result]; ok is 0 when the
+" daemon could not be reached so the caller can fall back to systemlist().
+function! s:call_daemon(ch, cmdname, lang, args_string, input_text, opts) abort
+  let req = {
+        \ 'method': a:cmdname,
+        \ 'params': {
+        \   'buf': bufnr('%'),
+        \   'lang': a:lang,
+        \   'args': split(a:args_string),
+        \   'opts': a:opts,
+        \ }}
+  if !empty(get(a:opts, 'file', ''))
+    let req.params.file = a:opts.file
+  else
+    let req.params.text = a:input_text
+  endif
+  try
+    let resp = ch_evalexpr(a:ch, req, {'timeout': get(g:, 'ts_helper_timeout', 5000)})
+  catch
+    return [0, {}]
+  endtry
+  if type(resp) != v:t_dict || empty(resp)
+    return [0, {}]
+  endif
+  if has_key(resp, 'error')
+    echohl ErrorMsg
+    echom 'ts_helper: ' . get(resp.error, 'message', 'helper error')
+    echohl None
+    return [1, {}]
+  endif
+  let result = get(resp, 'result', {})
+  return [1, result is v:null ? {} : result]
+endfunction
+
+function! s:daemon_close_buffer(bufnr) abort
+  if type(s:daemon_job) != v:t_job || job_status(s:daemon_job) !=# 'run'
+    return
+  endif
+  call ch_sendexpr(job_getchannel(s:daemon_job), {'method': 'close', 'params': {'buf': a:bufnr}})
+endfunction
+
+augroup ts_helper_daemon
+  autocmd!
+  autocmd BufWipeout * call s:daemon_close_buffer(str2nr(expand('<abuf>')))
+augroup END
+
+" Synchronous helper caller: uses the daemon when available, otherwise
+" systemlist(). The optional fifth argument is a dict of helper options
+" ('with_text', 'fold_query', 'file'); with 'file' the helper reads the
+" source from that path and input_text is not sent.
 " Returns decoded JSON (Vim dict/list) or empty {} / [] on error.
-function! s:call_helper_sync(cmdname, lang, args_string, input_text) abort
+function! s:call_helper_sync(cmdname, lang, args_string, input_text, ...) abort
+  let opts = a:0 > 0 ? a:1 : {}
   if !executable('python3')
     echom 'ts_helper: python3 not found in PATH'
     return {}
@@ -86,9 +182,21 @@ function! s:call_helper_sync(cmdname, lang, args_string, input_text) abort
     return {}
   endif
 
-  let cmd_str = s:build_cmd_str(a:lang, a:cmdname, a:args_string)
+  let ch = s:daemon_channel()
+  if ch isnot v:none
+    let [ok, data] = s:call_daemon(ch, a:cmdname, a:lang, a:args_string, a:input_text, opts)
+    if ok
+      return data
+    endif
+  endif
+
+  let cmd_str = s:build_cmd_str(a:lang, a:cmdname, a:args_string, opts)
   try
-    let json_lines = systemlist(cmd_str, a:input_text)
+    if !empty(get(opts, 'file', ''))
+      let json_lines = systemlist(cmd_str)
+    else
+      let json_lines = systemlist(cmd_str, a:input_text)
+    endif
   catch
     echom 'ts_helper: error running helper'
     return {}
@@ -127,6 +235,18 @@ function! s:buf_text() abort
   return join(getbufline('%', 1, '$'), "\n")
 endfunction
 
+" Source of the current buffer for the helper: [opts, text]. When the buffer
+" is unmodified and its file holds the same UTF-8/LF bytes, the helper reads
+" the file itself (opts.file) and no text is built or piped.
+function! s:buf_source(opts) abort
+  let path = expand('%:p')
+  if !&modified && filereadable(path) && &fileformat ==# 'unix' && !&bomb
+        \ && index(['', 'utf-8'], &fileencoding) >= 0
+    return [extend({'file': path}, a:opts), '']
+  endif
+  return [a:opts, s:buf_text()]
+endfunction
+
 " ------------------------
 " AST display & selection (synchronous)
 " ------------------------
@@ -138,16 +258,37 @@ function! s:show_ast() abort
     return
   endif
 
-  let data = s:call_helper_sync('ast', lang, '', s:buf_text())
+  let src = s:buf_text()
+  let data = s:call_helper_sync('ast', lang, '', src)
   if empty(data)
     echo 'ts_helper: empty AST or helper error'
     return
   endif
 
-  function! s:render_node(node, indent) abort
+  " The helper only sends byte ranges; leaf text is sliced from the buffer here
+  function! s:render_node(node, indent, src) abort
     if type(a:node) == type({})
       let sp = get(a:node, 'start_point', [0,0])
       let ep = get(a:node, 'end_point', [0,0])
+      let text = get(a:node, 'text', '')
+      if empty(text) && empty(get(a:node, 'children', []))
+        " same preview as the helper's --with-text: whitespace collapsed,
+        " cut to 120 characters, decoding only a window of the node
+        let sb = get(a:node, 'start_byte', 0)
+        let nbytes = get(a:node, 'end_byte', sb) - sb
+        let limit = 484
+        while 1
+          let cut = nbytes > limit
+          let text = substitute(trim(strpart(a:src, sb, cut ? limit : nbytes)), '\_s\+', ' ', 'g')
+          if !cut || strchars(text) > 120
+            break
+          endif
+          let limit = limit * 2
+        endwhile
+        if strchars(text) > 120
+          let text = strcharpart(text, 0, 117) . '...'
+        endif
+      endif
       let t = printf('%s%s [%d:%d - %d:%d] %s',
             \ repeat('  ', a:indent),
             \ get(a:node, 'type', '<unknown>'),
@@ -155,11 +296,11 @@ function! s:show_ast() abort
             \ sp[1],
             \ ep[0] + 1,
             \ ep[1],
-            \ get(a:node, 'text', ''))
+            \ text)
       let lines = [t]
       if has_key(a:node, 'children')
         for child in a:node.children
-          let lines += s:render_node(child, a:indent + 1)
+          let lines += s:render_node(child, a:indent + 1, a:src)
         endfor
       endif
       return lines
@@ -167,7 +308,7 @@ function! s:show_ast() abort
     return []
   endfunction
 
-  let lines = s:render_node(data, 0)
+  let lines = s:render_node(data, 0, src)
   if empty(lines)
     echo 'ts_helper: empty AST'
     return
@@ -190,7 +331,8 @@ function! s:select_node() abort
   let cursor = getpos('.')
   let row = cursor[1] - 1
   let col = cursor[2] - 1
-  let data = s:call_helper_sync('node_at', lang, printf('%d %d', row, col), s:buf_text())
+  let [opts, text] = s:buf_source({})
+  let data = s:call_helper_sync('node_at', lang, printf('%d %d', row, col), text, opts)
   if empty(data)
     echo 'ts_helper: no node at cursor or helper error'
     return
@@ -218,7 +360,13 @@ function! s:build_fold_data() abort
     return
   endif
 
-  let data = s:call_helper_sync('folds', lang, '', s:buf_text())
+  let opts = {}
+  let fold_queries = get(g:, 'ts_helper_fold_queries', {})
+  if has_key(fold_queries, lang)
+    let opts.fold_query = fold_queries[lang]
+  endif
+  let [opts, text] = s:buf_source(opts)
+  let data = s:call_helper_sync('folds', lang, '', text, opts)
   if empty(data)
     call s:disable_folds()
     return
@@ -237,11 +385,12 @@ function! s:build_fold_data() abort
       continue
     endif
 
-    " Ignore nodes that start at (0,0) and end at end-of-file (prevents whole-buffer wrapper nodes)
+    " Ignore nodes that start at (0,0) and end at end-of-file (prevents whole-buffer wrapper nodes).
+    " When the helper read the file, the final newline puts the end one row further.
     let sp_row = node.start_point[0]
     let sp_col = node.start_point[1]
     let ep_row = node.end_point[0]
-    if sp_row == 0 && sp_col == 0 && ep_row ==# (max_lnum - 1)
+    if sp_row == 0 && sp_col == 0 && ep_row >= (max_lnum - 1)
       continue
     endif
 
@@ -377,7 +526,8 @@ function! s:goto_symbol(next) abort
     return
   endif
 
-  let data = s:call_helper_sync('symbols', lang, '', s:buf_text())
+  let [opts, text] = s:buf_source({})
+  let data = s:call_helper_sync('symbols', lang, '', text, opts)
   if type(data) != type([]) || empty(data)
     echo 'ts_helper: no symbols found'
     return